@@ -1,26 +1,136 @@
+import json
 import os
+import re
 import duckdb
 
-# Path to the on-disk DuckDB database file
-DB_FILE = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), '..', 'data', 'duckdb.db')
+# Root directory for all on-disk data
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+# Path to the on-disk DuckDB database file of the default warehouse
+DB_FILE = os.path.join(DATA_DIR, 'duckdb.db')
+
+# Root of the hive-partitioned Parquet archive (year=/month=) for cold shipments
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+
+# Warehouse used when a request does not name one; keeps the paths above
+DEFAULT_WAREHOUSE = "default"
+
+# Pseudo-warehouse that fans cross-warehouse queries out to every shard
+ALL_WAREHOUSES = "all"
+
+# Optional JSON file listing warehouses (shards) and their settings, e.g.
+# {"miami": {"capacity_cm3": 60000000000}, "nyc": {"capacity_cm3": 25000000000}}
+WAREHOUSES_CONFIG_FILE = os.environ.get(
+    "WAREHOUSES_CONFIG_FILE",
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'warehouses.json')
+    ),
+)
+
+
+def load_warehouses() -> dict:
+    """
+    Resolve the configured warehouses. The default warehouse always exists.
+
+    Returns:
+        dict: Warehouse name -> settings dict (e.g. capacity_cm3).
+    """
+    warehouses = {DEFAULT_WAREHOUSE: {}}
+    if os.path.exists(WAREHOUSES_CONFIG_FILE):
+        with open(WAREHOUSES_CONFIG_FILE) as f:
+            warehouses.update(json.load(f))
+    for name in warehouses:
+        if name == ALL_WAREHOUSES or not re.fullmatch(r"[a-z0-9_-]+", name):
+            raise ValueError(f"Invalid warehouse name: {name!r}")
+    return warehouses
+
+
+WAREHOUSES = load_warehouses()
+
+
+def warehouse_db_file(warehouse: str = DEFAULT_WAREHOUSE) -> str:
+    """
+    Path of a warehouse's DuckDB shard. The default warehouse keeps DB_FILE.
+    """
+    if warehouse == DEFAULT_WAREHOUSE:
+        return DB_FILE
+    return os.path.join(DATA_DIR, 'warehouses', warehouse, 'duckdb.db')
+
+
+def warehouse_archive_dir(warehouse: str = DEFAULT_WAREHOUSE) -> str:
+    """
+    Path of a warehouse's Parquet archive. The default warehouse keeps ARCHIVE_DIR.
+    """
+    if warehouse == DEFAULT_WAREHOUSE:
+        return ARCHIVE_DIR
+    return os.path.join(DATA_DIR, 'warehouses', warehouse, 'archive')
+
+# Optional JSON file with DuckDB settings, e.g. {"threads": 4, "memory_limit": "2GB"}
+DUCKDB_CONFIG_FILE = os.environ.get(
+    "DUCKDB_CONFIG_FILE",
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', 'duckdb_config.json')
+    ),
 )
 
+# Environment variables override the config file, one per tunable setting
+DUCKDB_SETTING_ENV_VARS = {
+    "threads": "DUCKDB_THREADS",
+    "memory_limit": "DUCKDB_MEMORY_LIMIT",
+    "temp_directory": "DUCKDB_TEMP_DIRECTORY",
+}
+
+
+def load_duckdb_settings() -> dict:
+    """
+    Resolve DuckDB resource settings from the config file and environment.
+    Settings left unset fall back to DuckDB defaults.
+
+    Returns:
+        dict: Subset of {threads, memory_limit, temp_directory} that is configured.
+    """
+    settings = {}
+    if os.path.exists(DUCKDB_CONFIG_FILE):
+        with open(DUCKDB_CONFIG_FILE) as f:
+            file_settings = json.load(f)
+        settings.update(
+            {k: v for k, v in file_settings.items() if k in DUCKDB_SETTING_ENV_VARS}
+        )
+    for key, env_var in DUCKDB_SETTING_ENV_VARS.items():
+        if os.environ.get(env_var):
+            settings[key] = os.environ[env_var]
+    if "threads" in settings:
+        settings["threads"] = int(settings["threads"])
+    return settings
+
+
+DUCKDB_SETTINGS = load_duckdb_settings()
+
 
-def get_connection(in_memory: bool = False) -> duckdb.DuckDBPyConnection:
+def get_connection(
+    in_memory: bool = False, warehouse: str = DEFAULT_WAREHOUSE
+) -> duckdb.DuckDBPyConnection:
     """
-    Create and return a DuckDB connection.
+    Create and return a DuckDB connection with the configured resource settings.
 
     Args:
         in_memory (bool): If True, creates an in-memory database. Otherwise uses on-disk file.
+        warehouse (str): Warehouse whose on-disk shard to open.
     """
     if in_memory:
-        return duckdb.connect(database=':memory:')
-    # On-disk (persistent) mode
-    return duckdb.connect(database=DB_FILE)
+        return duckdb.connect(database=':memory:', config=DUCKDB_SETTINGS)
+    # On-disk (persistent) mode, one file per warehouse
+    db_file = warehouse_db_file(warehouse)
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    return duckdb.connect(database=db_file, config=DUCKDB_SETTINGS)
 
 
-def run_query(sql: str, params: tuple = None, in_memory: bool = False) -> list[dict]:
+def run_query(
+    sql: str,
+    params: tuple = None,
+    in_memory: bool = False,
+    warehouse: str = DEFAULT_WAREHOUSE,
+) -> list[dict]:
     """
     Execute an arbitrary SQL query and return results as a list of dicts.
 
@@ -28,11 +138,12 @@ def run_query(sql: str, params: tuple = None, in_memory: bool = False) -> list[d
         sql (str): SQL query to execute.
         params (tuple, optional): Query parameters.
         in_memory (bool): Whether to use in-memory database.
+        warehouse (str): Warehouse whose on-disk shard to query.
 
     Returns:
         list[dict]: Query results.
     """
-    conn = get_connection(in_memory)
+    conn = get_connection(in_memory, warehouse)
     if params:
         result = conn.execute(sql, params)
     else:
@@ -0,0 +1,32 @@
+from fastapi import HTTPException, Query, status
+from .db import ALL_WAREHOUSES, DEFAULT_WAREHOUSE, WAREHOUSES
+
+
+def shard_warehouse(
+    warehouse: str = Query(
+        DEFAULT_WAREHOUSE, description="Warehouse (shard) to read or write"
+    ),
+) -> str:
+    """
+    Resolve the `warehouse` query parameter to a single configured shard.
+    """
+    if warehouse not in WAREHOUSES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown warehouse: {warehouse}",
+        )
+    return warehouse
+
+
+def any_warehouse(
+    warehouse: str = Query(
+        DEFAULT_WAREHOUSE,
+        description=f"Warehouse (shard), or '{ALL_WAREHOUSES}' to aggregate across all",
+    ),
+) -> str:
+    """
+    Like shard_warehouse, but also accepts 'all' for fan-out queries.
+    """
+    if warehouse == ALL_WAREHOUSES:
+        return warehouse
+    return shard_warehouse(warehouse)
@@ -1,6 +1,11 @@
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .db import WAREHOUSES
 from .routers import upload, metrics, admin
+from .services import ensure_derived_tables
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -17,3 +22,14 @@ app.add_middleware(
 app.include_router(upload.router, prefix="/upload")
 app.include_router(metrics.router, prefix="/metrics")
 app.include_router(admin.router, prefix="/admin")
+
+
+@app.on_event("startup")
+def ensure_shipments_view():
+    # Databases created by older versions lack the unified view and aggregates.
+    # A broken shard is logged and skipped so the others still serve.
+    for warehouse in WAREHOUSES:
+        try:
+            ensure_derived_tables(warehouse=warehouse)
+        except Exception:
+            logger.exception("Could not prepare warehouse %r", warehouse)
@@ -62,3 +62,12 @@ class ConsolidationScope(BaseModel):
 
 class ExportRequest(BaseModel):
     scopes: List[ConsolidationScope]
+
+
+class ShipmentBatchRequest(BaseModel):
+    shipment_ids: List[conint(ge=4000000)] = Field(
+        ..., min_length=1, max_length=5000, description="Shipment IDs to fetch"
+    )
+    fields: Optional[List[str]] = Field(
+        None, description="Columns to return (shipment_id is always included)"
+    )
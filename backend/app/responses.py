@@ -0,0 +1,182 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is only offered when installed
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when installed
+    zstandard = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _to_builtin(obj: Any) -> Any:
+    """
+    Convert pandas/numpy values coming out of DuckDB result frames
+    into types every encoder understands.
+    """
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return None if np.isnan(obj) else float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def to_columnar(
+    rows: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None
+) -> Dict[str, List[Any]]:
+    """
+    Convert a list of row dicts into { column: [values...] } so keys
+    are sent once instead of once per row. `columns` keeps the shape of
+    an empty page; otherwise the first row's keys are used.
+    """
+    if columns is None:
+        columns = list(rows[0]) if rows else []
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+
+def _nan_to_none(obj: Any) -> Any:
+    """
+    Replace float NaN (missing values in numeric result columns) with None.
+    Encoders serialise native floats without calling `default`, so
+    _to_builtin never sees them.
+    """
+    if isinstance(obj, float):
+        return None if obj != obj else obj
+    if isinstance(obj, dict):
+        return {key: _nan_to_none(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(value) for value in obj]
+    return obj
+
+
+def _encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        # orjson already writes NaN as null
+        return orjson.dumps(
+            payload,
+            default=_to_builtin,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        _nan_to_none(payload), default=_to_builtin, separators=(",", ":")
+    ).encode()
+
+
+def _encode_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(_nan_to_none(payload), default=_to_builtin, use_bin_type=True)
+
+
+def _quality_values(header: str) -> Dict[str, float]:
+    """
+    Parse a comma-separated Accept/Accept-Encoding header into
+    { token: q }. Entries without a q parameter weigh 1.0, malformed
+    q-values weigh 0.
+    """
+    weights: Dict[str, float] = {}
+    for part in header.lower().split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[token] = q
+    return weights
+
+
+def _negotiate(header: str, offers: Sequence[str]) -> Optional[str]:
+    """
+    Pick the offer the client weighs highest, honouring exact tokens
+    before type/* and */* (or * for encodings). Ties go to the earlier
+    offer. None if the client accepts none of them.
+    """
+    weights = _quality_values(header)
+    best, best_q = None, 0.0
+    for offer in offers:
+        if offer in weights:
+            q = weights[offer]
+        elif "/" in offer:
+            q = weights.get(offer.split("/")[0] + "/*", weights.get("*/*", 0.0))
+        else:
+            q = weights.get("*", 0.0)
+        if q > best_q:
+            best, best_q = offer, q
+    return best
+
+
+def negotiated_response(
+    request: Request,
+    payload: Dict[str, Any],
+    columnar_key: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Response:
+    """
+    Encode `payload` according to the request:
+      - `?shape=columnar` turns payload[columnar_key] into column arrays
+        (keyed by `columns` when given, so empty pages keep their keys)
+      - MessagePack when the client's Accept weighs it above JSON
+      - bodies above COMPRESS_MIN_BYTES are compressed with the
+        Accept-Encoding the client weighs highest (zstd wins ties)
+    """
+    if columnar_key and request.query_params.get("shape") == "columnar":
+        payload = {
+            **payload,
+            columnar_key: to_columnar(payload[columnar_key], columns),
+        }
+
+    media_offers = ("application/json",)
+    if msgpack is not None:
+        media_offers += MSGPACK_MEDIA_TYPES
+    accept = request.headers.get("accept", "")
+    if _negotiate(accept, media_offers) in MSGPACK_MEDIA_TYPES:
+        body, media_type = _encode_msgpack(payload), "application/msgpack"
+    else:
+        body, media_type = _encode_json(payload), "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding_offers = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+        encoding = _negotiate(
+            request.headers.get("accept-encoding", ""), encoding_offers
+        )
+        if encoding == "zstd":
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers["Content-Encoding"] = "zstd"
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -1,5 +1,13 @@
-from fastapi import APIRouter, HTTPException, status
-from ..services import check_db_status, delete_db_file
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from ..db import ALL_WAREHOUSES, WAREHOUSES
+from ..dependencies import any_warehouse, shard_warehouse
+from ..services import (
+    ARCHIVE_AFTER_DAYS,
+    archive_delivered_shipments,
+    check_db_status,
+    delete_db_file,
+    storage_report,
+)
 
 router = APIRouter()
 
@@ -9,27 +17,54 @@ router = APIRouter()
     summary="Check DuckDB file status",
     status_code=status.HTTP_200_OK,
 )
-async def db_status():
+async def db_status(warehouse: str = Depends(shard_warehouse)):
     """
     Returns whether the DuckDB file exists, whether it has data,
     and how many shipments are loaded.
     """
-    status = check_db_status()
+    status = check_db_status(warehouse=warehouse)
     return status
 
 
+@router.get(
+    "/storage",
+    summary="Report DuckDB storage and memory usage",
+    status_code=status.HTTP_200_OK,
+)
+async def storage(warehouse: str = Depends(shard_warehouse)):
+    """
+    Returns file, WAL and archive sizes, block usage, per-table row counts,
+    memory in use and the active DuckDB resource settings.
+    """
+    try:
+        report = storage_report(warehouse=warehouse)
+    except FileNotFoundError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(exc),
+        )
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read storage info: {exc}",
+        )
+    return report
+
+
 @router.delete(
     "/db",
     summary="Delete the DuckDB database file",
     status_code=status.HTTP_200_OK,
 )
-async def delete_db():
+async def delete_db(warehouse: str = Depends(any_warehouse)):
     """
-    Deletes the on-disk DuckDB file.
+    Deletes the on-disk DuckDB file of a warehouse, or of every
+    warehouse with warehouse='all'.
     Next upload will recreate an empty DB.
     """
+    targets = list(WAREHOUSES) if warehouse == ALL_WAREHOUSES else [warehouse]
     try:
-        removed = delete_db_file()
+        removed = any([delete_db_file(warehouse=w) for w in targets])
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -39,3 +74,31 @@ async def delete_db():
         return {"message": "DuckDB file deleted", "deleted": True}
     else:
         return {"message": "No DuckDB file to delete", "deleted": False}
+
+
+@router.post(
+    "/archive",
+    summary="Archive old delivered shipments to Parquet",
+    status_code=status.HTTP_200_OK,
+)
+async def archive_shipments(
+    older_than_days: int = Query(
+        ARCHIVE_AFTER_DAYS,
+        ge=0,
+        description="Archive delivered shipments delivered more than this many days ago",
+    ),
+    warehouse: str = Depends(shard_warehouse),
+):
+    """
+    Moves delivered shipments older than the cutoff out of the hot table
+    into month-partitioned Parquet. Archived rows remain readable through
+    the unified shipments view.
+    """
+    try:
+        result = archive_delivered_shipments(older_than_days, warehouse)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to archive shipments: {exc}",
+        )
+    return result
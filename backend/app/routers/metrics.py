@@ -1,18 +1,27 @@
-from fastapi import APIRouter, HTTPException, Query, Path, status
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request, status
+from typing import List, Dict, Any, Literal, Optional
 from fastapi.responses import StreamingResponse
 import csv, io
+from urllib.parse import urlencode
 from pydantic import BaseModel
-from ..models import ConsolidationScope, ExportRequest
+from ..dependencies import any_warehouse, shard_warehouse
+from ..models import ConsolidationScope, ExportRequest, ShipmentBatchRequest
+from ..responses import negotiated_response
 from ..services import (
+    SHIPMENT_FIELDS,
     cargo_consolidation,
     warehouse_utilization,
     get_shipments,
     get_shipment_details,
+    get_shipments_batch,
+    shipment_columns,
     summary_statistics,
+    suggest_ids,
     received_count_by_carrier,
     volume_by_mode,
     throughput_over_time,
+    top_customers,
+    transit_time_percentiles,
 )
 
 router = APIRouter()
@@ -30,6 +39,7 @@ async def get_cargo_consolidation(
     arrival_date: Optional[str] = Query(
         None, description="Filter by arrival date (YYYY-MM-DD)"
     ),
+    warehouse: str = Depends(any_warehouse),
 ):
     """
     Returns groups of shipments that can be consolidated,
@@ -39,6 +49,7 @@ async def get_cargo_consolidation(
         groups = cargo_consolidation(
             destination=destination,
             arrival_date=arrival_date,
+            warehouse=warehouse,
         )
     except Exception as exc:
         raise HTTPException(
@@ -53,7 +64,9 @@ async def get_cargo_consolidation(
     summary="Export consolidation recommendations as CSV",
     status_code=status.HTTP_200_OK,
 )
-async def export_consolidation(req: ExportRequest):
+async def export_consolidation(
+    req: ExportRequest, warehouse: str = Depends(any_warehouse)
+):
     """
     Accepts a list of {destination, arrival_date} filters,
     fetches the matching consolidation groups, and returns a CSV file.
@@ -66,10 +79,11 @@ async def export_consolidation(req: ExportRequest):
                 groups = cargo_consolidation(
                     destination=scope.destination,
                     arrival_date=scope.arrival_date,
+                    warehouse=warehouse,
                 )
                 rows.extend(groups)
         else:
-            rows = cargo_consolidation()
+            rows = cargo_consolidation(warehouse=warehouse)
 
         # build CSV in-memory
         buffer = io.StringIO()
@@ -99,12 +113,12 @@ async def export_consolidation(req: ExportRequest):
     summary="Get current warehouse utilization",
     status_code=status.HTTP_200_OK,
 )
-async def get_warehouse_utilization():
+async def get_warehouse_utilization(warehouse: str = Depends(any_warehouse)):
     """
     Returns total volume of shipments and utilization percentage.
     """
     try:
-        utilization = warehouse_utilization()
+        utilization = warehouse_utilization(warehouse=warehouse)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -119,9 +133,10 @@ async def get_warehouse_utilization():
     status_code=status.HTTP_200_OK,
 )
 async def list_shipments(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(100, ge=1, le=1000),
-    status: Optional[str] = Query(None),
+    status_filter: Optional[str] = Query(None, alias="status"),
     destination: Optional[str] = Query(None),
     carrier: Optional[str] = Query(None),
     arrival_date_start: Optional[str] = Query(
@@ -133,17 +148,28 @@ async def list_shipments(
     search: Optional[int] = Query(
         None, description="Search by shipment_id or customer_id"
     ),
-) -> Dict[str, Any]:
+    warehouse: str = Depends(shard_warehouse),
+):
+    """
+    Returns a page of shipments. Supports `?shape=columnar`, MessagePack
+    via `Accept: application/msgpack`, and gzip/zstd compression.
+    """
     try:
         total_count, shipments = get_shipments(
             page=page,
             page_size=page_size,
-            status=status,
+            status=status_filter,
             destination=destination,
             carrier=carrier,
             arrival_date_start=arrival_date_start,
             arrival_date_end=arrival_date_end,
             search=search,
+            warehouse=warehouse,
+        )
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
         )
     except Exception as exc:
         raise HTTPException(
@@ -151,20 +177,88 @@ async def list_shipments(
             detail=f"Failed to fetch shipments: {exc}",
         )
 
-    return {
+    payload = {
         "page": page,
         "page_size": page_size,
         "total_count": total_count,
         "filters": {
-            "status": status,
+            "status": status_filter,
             "destination": destination,
             "carrier": carrier,
             "arrival_date_start": arrival_date_start,
             "arrival_date_end": arrival_date_end,
             "search": search,
+            "warehouse": warehouse,
         },
         "shipments": shipments,
     }
+    return negotiated_response(
+        request, payload, columnar_key="shipments", columns=SHIPMENT_FIELDS
+    )
+
+
+@router.post(
+    "/shipments/batch",
+    summary="Get details for many shipments in one query",
+    status_code=status.HTTP_200_OK,
+)
+async def shipments_batch(
+    request: Request,
+    req: ShipmentBatchRequest,
+    warehouse: str = Depends(shard_warehouse),
+):
+    """
+    Retrieve details for a list of shipment IDs, optionally projected
+    to the given fields. IDs that do not exist are listed under `missing`.
+    """
+    try:
+        shipments = get_shipments_batch(req.shipment_ids, req.fields, warehouse)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch shipments: {exc}",
+        )
+
+    found = {s["shipment_id"] for s in shipments}
+    missing = [i for i in dict.fromkeys(req.shipment_ids) if i not in found]
+    payload = {"shipments": shipments, "missing": missing}
+    return negotiated_response(
+        request,
+        payload,
+        columnar_key="shipments",
+        columns=shipment_columns(req.fields),
+    )
+
+
+@router.get(
+    "/shipments/suggest",
+    summary="Suggest shipment and customer ids by prefix",
+    status_code=status.HTTP_200_OK,
+)
+async def suggest_shipments(
+    prefix: str = Query(
+        ..., pattern=r"^[0-9]{1,10}$", description="Leading digits of the id"
+    ),
+    limit: int = Query(10, ge=1, le=100),
+    warehouse: str = Depends(shard_warehouse),
+) -> Dict[str, Any]:
+    """
+    Returns up to `limit` shipment_ids and customer_ids starting with `prefix`,
+    for use as search-box typeahead.
+    """
+    try:
+        matches = suggest_ids(prefix, limit, warehouse)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch suggestions: {exc}",
+        )
+    return {"prefix": prefix, **matches}
 
 
 @router.get(
@@ -174,12 +268,13 @@ async def list_shipments(
 )
 async def shipment_details(
     shipment_id: int = Path(..., ge=4000000, description="Unique shipment identifier"),
+    warehouse: str = Depends(shard_warehouse),
 ) -> Dict[str, Any]:
     """
     Retrieve details for a single shipment by its ID.
     """
     try:
-        shipment = get_shipment_details(shipment_id)
+        shipment = get_shipment_details(shipment_id, warehouse)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -200,12 +295,12 @@ async def shipment_details(
     summary="Get overall shipment summary stats",
     status_code=status.HTTP_200_OK,
 )
-async def get_summary():
+async def get_summary(warehouse: str = Depends(any_warehouse)):
     """
     Returns total shipments, on-time vs delayed counts, and warehouse utilization.
     """
     try:
-        stats = summary_statistics()
+        stats = summary_statistics(warehouse=warehouse)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -220,25 +315,37 @@ async def get_summary():
     status_code=status.HTTP_200_OK,
 )
 async def get_received_by_carrier(
+    request: Request,
     start_date: Optional[str] = Query(
         None, description="Inclusive start date, format YYYY-MM-DD"
     ),
     end_date: Optional[str] = Query(
         None, description="Inclusive end date, format YYYY-MM-DD"
     ),
+    warehouse: str = Depends(shard_warehouse),
 ):
     """
     Returns a list of { arrival_date, carrier, count } for shipments received,
     filtered by optional date range.
     """
     try:
-        data = received_count_by_carrier(start_date, end_date)
+        data = received_count_by_carrier(start_date, end_date, warehouse)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch received-by-carrier data: {exc}",
         )
-    return {"received_by_carrier": data}
+    return negotiated_response(
+        request,
+        {"received_by_carrier": data},
+        columnar_key="received_by_carrier",
+        columns=("arrival_date", "carrier", "count"),
+    )
 
 
 @router.get(
@@ -246,12 +353,12 @@ async def get_received_by_carrier(
     summary="Get shipment volume by mode",
     status_code=status.HTTP_200_OK,
 )
-async def get_volume_by_mode():
+async def get_volume_by_mode(warehouse: str = Depends(shard_warehouse)):
     """
     Returns a list of { mode, total_volume } for shipments.
     """
     try:
-        data = volume_by_mode()
+        data = volume_by_mode(warehouse=warehouse)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -268,16 +375,116 @@ async def get_volume_by_mode():
 async def get_throughput(
     start_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
     end_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
+    warehouse: str = Depends(any_warehouse),
 ):
     """
     Returns a list of { arrival_date, packages_received } for each day
     shipments were received, filtered by optional date range.
     """
     try:
-        data = throughput_over_time(start_date, end_date)
+        data = throughput_over_time(start_date, end_date, warehouse)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch throughput data: {exc}",
         )
     return {"throughput": data}
+
+
+@router.get(
+    "/customers/top",
+    summary="Get top customers by shipment count, weight or volume",
+    status_code=status.HTTP_200_OK,
+)
+async def get_top_customers(
+    metric: Literal["shipments", "weight", "volume"] = Query(
+        "volume", description="Ranking metric"
+    ),
+    limit: int = Query(10, ge=1, le=1000, description="Number of customers (K)"),
+    destination: Optional[str] = Query(
+        None, description="Filter by destination code (e.g. SVG, DOM)"
+    ),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
+    approximate: bool = Query(
+        False, description="Rank from monthly heavy-hitter candidates (range widened to whole months)"
+    ),
+    warehouse: str = Depends(shard_warehouse),
+):
+    """
+    Returns a list of { customer_id, shipment_count, total_weight,
+    total_volume, shipments_url } for the top-K customers, where
+    shipments_url points at the matching /metrics/shipments search, plus
+    the start_date/end_date range that was actually counted.
+    """
+    try:
+        customers, counted_start, counted_end = top_customers(
+            metric=metric,
+            limit=limit,
+            destination=destination,
+            start_date=start_date,
+            end_date=end_date,
+            approximate=approximate,
+            warehouse=warehouse,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch top customers: {exc}",
+        )
+
+    for customer in customers:
+        search_params = {"search": int(customer["customer_id"]), "warehouse": warehouse}
+        if destination:
+            search_params["destination"] = destination
+        if counted_start:
+            search_params["arrival_date_start"] = counted_start
+        if counted_end:
+            search_params["arrival_date_end"] = counted_end
+        customer["shipments_url"] = f"/metrics/shipments?{urlencode(search_params)}"
+
+    return {
+        "top_customers": customers,
+        "start_date": counted_start,
+        "end_date": counted_end,
+    }
+
+
+@router.get(
+    "/transit-times",
+    summary="Get dwell and transit time percentiles",
+    status_code=status.HTTP_200_OK,
+)
+async def get_transit_times(
+    group_by: Literal["carrier", "mode", "destination"] = Query(
+        "carrier", description="Dimension to break distributions down by"
+    ),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD inclusive"),
+    warehouse: str = Depends(shard_warehouse),
+):
+    """
+    Returns dwell (arrival -> departure) and transit (departure -> delivered)
+    distributions in days, with count, mean, p50, p90 and p99 per group,
+    for shipments arriving in the optional date range.
+    """
+    try:
+        data = transit_time_percentiles(group_by, start_date, end_date, warehouse)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch transit times: {exc}",
+        )
+    return {"group_by": group_by, "transit_times": data}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from ..db import get_connection
-from ..services import dedupe_shipments
+from ..dependencies import shard_warehouse
+from ..services import replace_shipments
 import pandas as pd
 import io
 
@@ -22,12 +23,36 @@ EXPECTED_COLUMNS = {
     "delivered_date",
 }
 
+# Date columns -> whether a value is required; values must be YYYY-MM-DD dates
+DATE_COLUMNS = {
+    "arrival_date": True,
+    "departure_date": False,
+    "delivered_date": False,
+}
+
+
+def _invalid_dates(values: pd.Series, required: bool = False) -> pd.Series:
+    """
+    Values that are not valid YYYY-MM-DD calendar dates. Empty values
+    only count as invalid when the column is required.
+    """
+    text = values.fillna("").astype(str).str.strip()
+    if not required:
+        text = text[text != ""]
+    valid = text.str.fullmatch(r"\d{4}-\d{2}-\d{2}") & pd.to_datetime(
+        text, format="%Y-%m-%d", errors="coerce"
+    ).notna()
+    return text[~valid]
+
 
 @router.post("/", summary="Upload CSV file containing shipment data", status_code=status.HTTP_201_CREATED)
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...), warehouse: str = Depends(shard_warehouse)
+):
     """
     Uploads a CSV file, validates columns, processes it in-memory,
-    loads into DuckDB as 'shipments', and drops duplicates automatically.
+    loads into the warehouse's DuckDB shard as 'shipments', and drops
+    duplicates automatically.
     Returns total rows and count of duplicates removed.
     """
     if not file.filename.lower().endswith(".csv"):
@@ -60,23 +85,31 @@ async def upload_csv(file: UploadFile = File(...)):
             detail="; ".join(detail_parts),
         )
 
+    # Validate dates before the current dataset is touched
+    for column, required in DATE_COLUMNS.items():
+        invalid = _invalid_dates(df[column], required)
+        if not invalid.empty:
+            samples = ", ".join(repr(v) for v in invalid.unique()[:5])
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Invalid {column} in {len(invalid)} rows, "
+                    f"expected YYYY-MM-DD: {samples}"
+                ),
+            )
+
     try:
-        conn = get_connection(in_memory=False)
-        # Load raw data
-        conn.execute("DROP TABLE IF EXISTS shipments;")
+        conn = get_connection(in_memory=False, warehouse=warehouse)
         conn.register("__temp_shipments", df)
-        conn.execute(
-            """
-            CREATE TABLE shipments AS
-            SELECT * FROM __temp_shipments;
-            """
-        )
-        # Count before dedupe
-        total_before = conn.execute("SELECT COUNT(*) FROM shipments;").fetchone()[0]
-        # Remove duplicates
-        removed = dedupe_shipments()
-        # Count after dedupe
-        total_after = conn.execute("SELECT COUNT(*) FROM shipments;").fetchone()[0]
+        # Load raw data, keeping one row per shipment_id. The new upload
+        # replaces the whole dataset, archived partitions included, but only
+        # once it has loaded successfully.
+        total_before = len(df)
+        try:
+            removed = replace_shipments(conn, "__temp_shipments", warehouse=warehouse)
+        finally:
+            conn.unregister("__temp_shipments")
+        total_after = total_before - removed
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -88,4 +121,5 @@ async def upload_csv(file: UploadFile = File(...)):
         "total_uploaded": total_before,
         "duplicates_removed": removed,
         "total_shipments": total_after,
+        "warehouse": warehouse,
     }
@@ -1,45 +1,383 @@
-from typing import List, Dict, Any, Optional
-from .db import DB_FILE, get_connection, run_query
+from typing import Callable, List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from .db import (
+    ALL_WAREHOUSES,
+    DEFAULT_WAREHOUSE,
+    DUCKDB_SETTINGS,
+    WAREHOUSES,
+    get_connection,
+    run_query,
+    warehouse_archive_dir,
+    warehouse_db_file,
+)
+import glob
 import os
+import re
+import shutil
+import threading
+import numpy as np
 
-# Total warehouse capacity in cubic centimeters
+# Default warehouse capacity in cubic centimeters (override per warehouse
+# with "capacity_cm3" in the warehouses config)
 WAREHOUSE_CAPACITY_CM3 = 60_000_000_000
 
+# Delivered shipments older than this many days (by delivered_date) are archived
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
 
-def dedupe_shipments() -> int:
+# Columns of an uploaded shipment row, used to validate projected field lists
+SHIPMENT_FIELDS = (
+    "shipment_id",
+    "customer_id",
+    "origin",
+    "destination",
+    "weight",
+    "volume",
+    "carrier",
+    "mode",
+    "status",
+    "arrival_date",
+    "departure_date",
+    "delivered_date",
+)
+
+# Aggregate tables rebuilt from the shipments view on every upload
+DERIVED_TABLES = ("customer_top_candidates", "transit_daily_hist")
+
+# Ranking metrics for top_customers -> column they order by
+TOP_CUSTOMER_METRICS = {
+    "shipments": "shipment_count",
+    "weight": "total_weight",
+    "volume": "total_volume",
+}
+
+# Customers kept per (destination, month, metric) for approximate top-K
+TOP_CUSTOMER_CANDIDATES = 200
+
+# Unified view over the hot `shipments` table and the Parquet archive.
+# Current-state queries (status='received') read the hot table directly.
+SHIPMENTS_VIEW = "shipments_all"
+
+
+def warehouse_capacity(warehouse: str = DEFAULT_WAREHOUSE) -> int:
+    """
+    Capacity of a warehouse in cubic centimeters.
+    """
+    return int(WAREHOUSES[warehouse].get("capacity_cm3", WAREHOUSE_CAPACITY_CM3))
+
+
+def has_shipments(warehouse: str = DEFAULT_WAREHOUSE) -> bool:
+    """
+    Cheap check that a shard's database file exists and has a shipments
+    table, without scanning any data.
+    """
+    if not os.path.exists(warehouse_db_file(warehouse)):
+        return False
+    tables = run_query(
+        "SELECT table_name FROM duckdb_tables() WHERE table_name = 'shipments';",
+        warehouse=warehouse,
+    )
+    return bool(tables)
+
+
+def _fan_out(fn: Callable[..., Any], *args, **kwargs) -> Dict[str, Any]:
+    """
+    Run `fn(*args, warehouse=w, **kwargs)` on every warehouse shard that
+    has a shipments table, in parallel. DuckDB releases the GIL while
+    executing, so shards are queried concurrently from a thread pool.
+
+    An exception on any shard is re-raised, so a failing shard fails the
+    request instead of silently dropping out of the totals.
+
+    Returns:
+      { warehouse: result } for shards that have shipments loaded
+    """
+
+    def run_shard(warehouse: str) -> Any:
+        if not has_shipments(warehouse=warehouse):
+            return None
+        return fn(*args, warehouse=warehouse, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=len(WAREHOUSES)) as pool:
+        results = dict(zip(WAREHOUSES, pool.map(run_shard, WAREHOUSES)))
+    return {w: r for w, r in results.items() if r is not None}
+
+
+def _archive_glob(warehouse: str = DEFAULT_WAREHOUSE) -> str:
+    return os.path.join(warehouse_archive_dir(warehouse), "**", "*.parquet")
+
+
+def _parse_date(value: str) -> date:
+    """
+    Parse a 'YYYY-MM-DD' filter value.
+
+    Raises:
+      ValueError: if the value is not a full YYYY-MM-DD date, since
+      arrival_date is compared as a string and partial dates would
+      silently select the wrong range.
+    """
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def _arrival_range_filters(
+    start_date: Optional[str] = None, end_date: Optional[str] = None
+) -> (List[str], List[Any]):
+    """
+    Build arrival_date range predicates against the unified view.
+
+    The range is also expressed as plain comparisons on the year/month
+    partition columns (month only when both ends share a year). DuckDB
+    pushes those through the view and skips archive files outside the
+    range; computed expressions over them are not pushed down.
+    """
+    filters: List[str] = []
+    params: List[Any] = []
+    start = _parse_date(start_date) if start_date else None
+    end = _parse_date(end_date) if end_date else None
+
+    if start:
+        filters.append("arrival_date >= ?")
+        params.append(start_date)
+        filters.append("year >= ?")
+        params.append(start.year)
+    if end:
+        filters.append("arrival_date <= ?")
+        params.append(end_date)
+        filters.append("year <= ?")
+        params.append(end.year)
+    if start and end and start.year == end.year:
+        filters.append("month >= ?")
+        params.append(start.month)
+        filters.append("month <= ?")
+        params.append(end.month)
+
+    return filters, params
+
+
+def _shipments_view_sql(
+    warehouse: str = DEFAULT_WAREHOUSE, include_archive: bool = True
+) -> str:
+    hot_sql = """
+    SELECT
+      *,
+      year(TRY_CAST(arrival_date AS DATE)) AS year,
+      month(TRY_CAST(arrival_date AS DATE)) AS month
+    FROM shipments
+    """
+    if include_archive and glob.glob(_archive_glob(warehouse=warehouse), recursive=True):
+        archive_path = _archive_glob(warehouse=warehouse).replace("'", "''")
+        hot_sql += f"""
+    UNION ALL BY NAME
+    SELECT * FROM read_parquet('{archive_path}', hive_partitioning = true)
+    """
+    return f"CREATE OR REPLACE VIEW {SHIPMENTS_VIEW} AS {hot_sql};"
+
+
+def refresh_shipments_view(warehouse: str = DEFAULT_WAREHOUSE) -> None:
+    """
+    (Re)create the unified shipments view.
+
+    The hot table exposes year/month derived from arrival_date so both
+    branches share the archive's partition columns (NULL when arrival_date
+    does not parse, so such rows never fail a query). The archive branch is
+    only included once at least one Parquet file exists, since read_parquet
+    fails to bind on an empty glob.
+    """
+    run_query(_shipments_view_sql(warehouse=warehouse), warehouse=warehouse)
+
+
+def archive_delivered_shipments(
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    warehouse: str = DEFAULT_WAREHOUSE,
+) -> Dict[str, Any]:
+    """
+    Move delivered shipments whose delivered_date is older than
+    `older_than_days` out of the hot table into month-partitioned Parquet
+    under the warehouse's archive dir (year=YYYY/month=M), then refresh
+    the unified view.
+
+    Returns:
+      { archived: int, cutoff_date: str }
+    """
+    cutoff = (date.today() - timedelta(days=older_than_days)).isoformat()
+    archive_dir = warehouse_archive_dir(warehouse)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    conn = get_connection(in_memory=False, warehouse=warehouse)
+    conn.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE __archive_batch AS
+        SELECT * FROM shipments
+        WHERE status = 'delivered'
+          AND TRY_CAST(delivered_date AS DATE) < CAST(? AS DATE)
+          AND TRY_CAST(arrival_date AS DATE) IS NOT NULL;
+        """,
+        (cutoff,),
+    )
+    archived = conn.execute("SELECT COUNT(*) FROM __archive_batch;").fetchone()[0]
+
+    if archived:
+        archive_path = archive_dir.replace("'", "''")
+        conn.execute(
+            f"""
+            COPY (
+              SELECT
+                *,
+                year(TRY_CAST(arrival_date AS DATE)) AS year,
+                month(TRY_CAST(arrival_date AS DATE)) AS month
+              FROM __archive_batch
+            ) TO '{archive_path}'
+            (FORMAT parquet, PARTITION_BY (year, month), APPEND);
+            """
+        )
+        conn.execute(
+            """
+            DELETE FROM shipments
+            WHERE shipment_id IN (SELECT shipment_id FROM __archive_batch);
+            """
+        )
+
+    conn.execute("DROP TABLE IF EXISTS __archive_batch;")
+    refresh_shipments_view(warehouse=warehouse)
+    checkpoint_database(warehouse=warehouse)
+    return {"archived": archived, "cutoff_date": cutoff}
+
+
+def clear_archive(warehouse: str = DEFAULT_WAREHOUSE) -> bool:
+    """
+    Remove every archived Parquet partition.
+    Returns True if an archive directory was deleted.
+    """
+    archive_dir = warehouse_archive_dir(warehouse)
+    if os.path.isdir(archive_dir):
+        shutil.rmtree(archive_dir)
+        return True
+    return False
+
+
+def _staging(table: str) -> str:
+    return f"__staging_{table}"
+
+
+def dedupe_shipments(conn, source: str, table: str = "shipments") -> int:
     """
-    Remove duplicate shipments by keeping only the earliest arrival for each shipment_id.
+    Create `table` from `source`, keeping only the earliest arrival for
+    each shipment_id. Deduplicating inside the initial CREATE avoids
+    rewriting the table and leaving its old blocks behind.
     Returns the count of duplicates removed.
     """
-    # Count distinct IDs vs raw rows
-    before = run_query("SELECT COUNT(*) AS c FROM shipments;")[0]["c"]
-    sql = """
-    CREATE OR REPLACE TABLE shipments AS
-    SELECT * FROM (
-        SELECT *, ROW_NUMBER() OVER (
+    before = conn.execute(f"SELECT COUNT(*) FROM {source};").fetchone()[0]
+    conn.execute(
+        f"""
+        CREATE TABLE {table} AS
+        SELECT * FROM {source}
+        QUALIFY ROW_NUMBER() OVER (
             PARTITION BY shipment_id
             ORDER BY arrival_date
-        ) AS rn
-        FROM shipments
-    ) sub
-    WHERE rn = 1;
-    """
-    run_query(sql)
-    after = run_query("SELECT COUNT(*) AS c FROM shipments;")[0]["c"]
-    removed = before - after
+        ) = 1;
+        """
+    )
+    after = conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+    return before - after
+
+
+def replace_shipments(conn, source: str, warehouse: str = DEFAULT_WAREHOUSE) -> int:
+    """
+    Replace the warehouse's dataset with the rows of `source`.
+
+    The new shipments and their aggregates are built in staging tables
+    first. Only once that succeeds are the old tables swapped out in a
+    single transaction and the Parquet archive deleted, so a failed load
+    leaves the previous dataset untouched. The old blocks are freed by the
+    closing checkpoint and reused by the next load.
+    Returns the count of duplicates removed.
+    """
+    tables = ("shipments",) + DERIVED_TABLES
+
+    def drop_staging() -> None:
+        for table in tables:
+            conn.execute(f"DROP TABLE IF EXISTS {_staging(table)};")
+
+    drop_staging()
+    try:
+        removed = dedupe_shipments(conn, source, table=_staging("shipments"))
+        for table in DERIVED_TABLES:
+            _build_derived_table(
+                table,
+                warehouse=warehouse,
+                source=_staging("shipments"),
+                target=_staging(table),
+            )
+
+        conn.execute("BEGIN TRANSACTION;")
+        try:
+            conn.execute(f"DROP VIEW IF EXISTS {SHIPMENTS_VIEW};")
+            for table in tables:
+                conn.execute(f"DROP TABLE IF EXISTS {table};")
+                conn.execute(f"ALTER TABLE {_staging(table)} RENAME TO {table};")
+            # The archive belongs to the old dataset, so the view skips it
+            conn.execute(_shipments_view_sql(warehouse=warehouse, include_archive=False))
+            conn.execute("COMMIT;")
+        except Exception:
+            conn.execute("ROLLBACK;")
+            raise
+    except Exception:
+        drop_staging()
+        raise
+
+    clear_archive(warehouse=warehouse)
+    checkpoint_database(warehouse=warehouse)
     return removed
 
 
 def cargo_consolidation(
     destination: Optional[str] = None,
     arrival_date: Optional[str] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
+    min_group_size: int = 2,
 ) -> List[Dict[str, Any]]:
     """
     Suggest shipments in status='received' that arrived on the same day
     to the same destination, optionally filtered by those fields.
     Returns destination, arrival_date, group_count, and
     shipments as a list of { shipment_id, customer_id }.
+
+    With warehouse='all' groups are merged across shards, and each
+    shipment also carries the warehouse it sits in.
     """
+    if warehouse == ALL_WAREHOUSES:
+        # Shards return singletons too: they may pair up with other hubs
+        partials = _fan_out(
+            cargo_consolidation, destination, arrival_date, min_group_size=1
+        )
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for shard, rows in partials.items():
+            for row in rows:
+                key = (row["destination"], row["arrival_date"])
+                group = merged.setdefault(
+                    key,
+                    {
+                        "destination": row["destination"],
+                        "arrival_date": row["arrival_date"],
+                        "group_count": 0,
+                        "shipments": [],
+                    },
+                )
+                group["group_count"] += row["group_count"]
+                group["shipments"].extend(
+                    {**shipment, "warehouse": shard} for shipment in row["shipments"]
+                )
+        return [
+            group
+            for _, group in sorted(merged.items())
+            if group["group_count"] >= min_group_size
+        ]
+
     filters = ["status = 'received'"]
     params: List[Any] = []
 
@@ -65,9 +403,9 @@ def cargo_consolidation(
     FROM shipments
     {where_clause}
     GROUP BY destination, arrival_date
-    HAVING COUNT(*) > 1;
+    HAVING COUNT(*) >= ?;
     """
-    rows = run_query(sql, tuple(params))
+    rows = run_query(sql, tuple(params) + (min_group_size,), warehouse=warehouse)
 
     # Transform the comma-string into a real list of dicts:
     for row in rows:
@@ -80,22 +418,45 @@ def cargo_consolidation(
     return rows
 
 
-def warehouse_utilization() -> Dict[str, Any]:
+def _merge_utilization(parts) -> Dict[str, Any]:
+    """
+    Combine per-shard utilization: volumes and capacities are summed.
+    """
+    parts = list(parts)
+    total_volume = sum(p["total_volume"] for p in parts)
+    capacity = sum(p["capacity_cm3"] for p in parts) or WAREHOUSE_CAPACITY_CM3
+    return {
+        "total_volume": total_volume,
+        "capacity_cm3": capacity,
+        "utilization_percent": (total_volume / capacity) * 100,
+    }
+
+
+def warehouse_utilization(warehouse: str = DEFAULT_WAREHOUSE) -> Dict[str, Any]:
     """
     Calculate warehouse utilization based on shipments currently in the warehouse.
     Only shipments with status='received' occupy warehouse space.
+    With warehouse='all' volumes and capacities are summed across shards.
 
     Returns:
-      { total_volume: int, utilization_percent: float }
+      { total_volume: int, capacity_cm3: int, utilization_percent: float }
     """
+    if warehouse == ALL_WAREHOUSES:
+        return _merge_utilization(_fan_out(warehouse_utilization).values())
+
     sql = (
         "SELECT COALESCE(SUM(volume), 0) AS total_volume "
         "FROM shipments WHERE status = 'received';"
     )
-    result = run_query(sql)
+    result = run_query(sql, warehouse=warehouse)
     total_volume = result[0].get("total_volume", 0)
-    utilization = (total_volume / WAREHOUSE_CAPACITY_CM3) * 100
-    return {"total_volume": total_volume, "utilization_percent": utilization}
+    capacity = warehouse_capacity(warehouse)
+    utilization = (total_volume / capacity) * 100
+    return {
+        "total_volume": total_volume,
+        "capacity_cm3": capacity,
+        "utilization_percent": utilization,
+    }
 
 
 def get_shipments(
@@ -107,6 +468,7 @@ def get_shipments(
     arrival_date_start: Optional[str] = None,
     arrival_date_end: Optional[str] = None,
     search: Optional[int] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
 ) -> (int, List[Dict[str, Any]]):
     offset = (page - 1) * page_size
     where_clauses = []
@@ -121,12 +483,11 @@ def get_shipments(
     if carrier:
         where_clauses.append("carrier = ?")
         params.append(carrier)
-    if arrival_date_start:
-        where_clauses.append("arrival_date >= ?")
-        params.append(arrival_date_start)
-    if arrival_date_end:
-        where_clauses.append("arrival_date <= ?")
-        params.append(arrival_date_end)
+    range_filters, range_params = _arrival_range_filters(
+        arrival_date_start, arrival_date_end
+    )
+    where_clauses.extend(range_filters)
+    params.extend(range_params)
     if search is not None:
         where_clauses.append("(shipment_id = ? OR customer_id = ?)")
         params.extend([search, search])
@@ -134,24 +495,26 @@ def get_shipments(
     where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
     # Count total
-    count_sql = f"SELECT COUNT(*) AS total FROM shipments {where_sql};"
-    total_count = run_query(count_sql, tuple(params))[0]["total"]
+    count_sql = f"SELECT COUNT(*) AS total FROM {SHIPMENTS_VIEW} {where_sql};"
+    total_count = run_query(count_sql, tuple(params), warehouse=warehouse)[0]["total"]
 
     # Fetch page
     page_sql = f"""
-        SELECT *
-        FROM shipments
+        SELECT * EXCLUDE (year, month)
+        FROM {SHIPMENTS_VIEW}
         {where_sql}
         ORDER BY shipment_id
         LIMIT ? OFFSET ?;
     """
     page_params = tuple(params) + (page_size, offset)
-    rows = run_query(page_sql, page_params)
+    rows = run_query(page_sql, page_params, warehouse=warehouse)
 
     return total_count, rows
 
 
-def get_shipment_details(shipment_id: int) -> Optional[Dict[str, Any]]:
+def get_shipment_details(
+    shipment_id: int, warehouse: str = DEFAULT_WAREHOUSE
+) -> Optional[Dict[str, Any]]:
     """
     Retrieve the details for a single shipment by its ID.
 
@@ -161,36 +524,181 @@ def get_shipment_details(shipment_id: int) -> Optional[Dict[str, Any]]:
     Returns:
       - A dict of shipment fields, or None if not found
     """
-    sql = "SELECT * FROM shipments WHERE shipment_id = ?;"
-    results = run_query(sql, (shipment_id,))
+    sql = f"SELECT * EXCLUDE (year, month) FROM {SHIPMENTS_VIEW} WHERE shipment_id = ?;"
+    results = run_query(sql, (shipment_id,), warehouse=warehouse)
     return results[0] if results else None
 
 
-def summary_statistics() -> Dict[str, Any]:
+def shipment_columns(fields: Optional[List[str]] = None) -> List[str]:
+    """
+    Columns returned for a projected shipment lookup: shipment_id followed
+    by the requested fields in SHIPMENT_FIELDS order, or all of them.
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return list(SHIPMENT_FIELDS)
+    unknown = set(fields) - set(SHIPMENT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["shipment_id"] + [
+        f for f in SHIPMENT_FIELDS if f in fields and f != "shipment_id"
+    ]
+
+
+def get_shipments_batch(
+    shipment_ids: List[int],
+    fields: Optional[List[str]] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve many shipments in one query by joining against the id list.
+
+    Args:
+      - shipment_ids: unique identifiers of the shipments to fetch
+      - fields: optional subset of SHIPMENT_FIELDS to project;
+                shipment_id is always returned
+
+    Returns:
+      - A list of shipment dicts ordered by shipment_id (unknown ids are omitted)
+    """
+    columns = shipment_columns(fields)
+    select_sql = ", ".join(f"s.{c}" for c in columns)
+    sql = f"""
+    SELECT {select_sql}
+    FROM {SHIPMENTS_VIEW} s
+    JOIN (SELECT DISTINCT UNNEST(CAST(? AS BIGINT[])) AS shipment_id) ids
+      ON s.shipment_id = ids.shipment_id
+    ORDER BY s.shipment_id;
+    """
+    return run_query(sql, (list(shipment_ids),), warehouse=warehouse)
+
+
+# Sorted shipment/customer id arrays backing suggest_ids, per warehouse,
+# each tagged with the data version it was built from
+_id_indexes: Dict[str, Dict[str, Any]] = {}
+_id_index_lock = threading.Lock()
+
+
+def _data_version(warehouse: str = DEFAULT_WAREHOUSE) -> Optional[int]:
+    """
+    Cheap change marker for the loaded data: the DuckDB file's mtime.
+    Uploads and archiving end with a CHECKPOINT, which rewrites the file.
+    """
+    try:
+        return os.stat(warehouse_db_file(warehouse)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _get_id_index(warehouse: str = DEFAULT_WAREHOUSE) -> Dict[str, Any]:
+    """
+    Return the warehouse's in-memory id index, rebuilding it when the
+    data version changed. Shards without a shipments table get empty arrays.
+    """
+    version = _data_version(warehouse=warehouse)
+    with _id_index_lock:
+        _id_index = _id_indexes.setdefault(
+            warehouse, {"version": None, "shipment_id": None, "customer_id": None}
+        )
+        if _id_index["version"] != version or _id_index["shipment_id"] is None:
+            # The file may exist without data, e.g. opened by another query
+            loaded = has_shipments(warehouse=warehouse)
+            conn = get_connection(in_memory=False, warehouse=warehouse)
+            for column in ("shipment_id", "customer_id"):
+                if not loaded:
+                    _id_index[column] = np.empty(0, dtype=np.int64)
+                    continue
+                values = conn.execute(
+                    f"SELECT DISTINCT {column} FROM {SHIPMENTS_VIEW} ORDER BY 1;"
+                ).fetchnumpy()[column]
+                _id_index[column] = np.asarray(values, dtype=np.int64)
+            _id_index["version"] = version
+        return _id_index
+
+
+def _prefix_matches(ids: np.ndarray, prefix: str, limit: int) -> List[int]:
+    """
+    Find up to `limit` ids whose decimal form starts with `prefix`.
+
+    For each possible digit count the prefix maps to one contiguous id
+    range, located with binary search on the sorted array. Ranges are
+    visited shortest-first, so results come back in ascending order.
+    """
+    if ids.size == 0 or prefix.startswith("0"):
+        return []
+    value = int(prefix)
+    max_digits = len(str(int(ids[-1])))
+    matches: List[int] = []
+    for digits in range(len(prefix), max_digits + 1):
+        scale = 10 ** (digits - len(prefix))
+        lo = np.searchsorted(ids, value * scale, side="left")
+        hi = np.searchsorted(ids, (value + 1) * scale, side="left")
+        matches.extend(ids[lo : min(hi, lo + limit - len(matches))].tolist())
+        if len(matches) >= limit:
+            break
+    return matches
+
+
+def suggest_ids(
+    prefix: str, limit: int = 10, warehouse: str = DEFAULT_WAREHOUSE
+) -> Dict[str, List[int]]:
+    """
+    Typeahead for shipment and customer ids, served from sorted in-memory
+    arrays without querying DuckDB (except to rebuild after a data change).
+
+    Returns:
+      { shipment_ids: [int], customer_ids: [int] }
+    """
+    if _data_version(warehouse=warehouse) is None:
+        return {"shipment_ids": [], "customer_ids": []}
+    index = _get_id_index(warehouse=warehouse)
+    return {
+        "shipment_ids": _prefix_matches(index["shipment_id"], prefix, limit),
+        "customer_ids": _prefix_matches(index["customer_id"], prefix, limit),
+    }
+
+
+def summary_statistics(warehouse: str = DEFAULT_WAREHOUSE) -> Dict[str, Any]:
     """
     Returns overall summary:
       - total_shipments
       - on_time (delivered)
       - delayed (not yet delivered)
       - warehouse_utilization (total_volume & percent)
+
+    With warehouse='all' the counts are summed across shards.
     """
+    if warehouse == ALL_WAREHOUSES:
+        partials = _fan_out(summary_statistics)
+        return {
+            "total_shipments": sum(p["total_shipments"] for p in partials.values()),
+            "on_time": sum(p["on_time"] or 0 for p in partials.values()),
+            "delayed": sum(p["delayed"] or 0 for p in partials.values()),
+            "warehouse_utilization": _merge_utilization(
+                p["warehouse_utilization"] for p in partials.values()
+            ),
+            "warehouses": sorted(partials),
+        }
+
     # Total shipments
-    total = run_query("SELECT COUNT(*) AS total_shipments FROM shipments;")[0][
-        "total_shipments"
-    ]
+    total = run_query(
+        f"SELECT COUNT(*) AS total_shipments FROM {SHIPMENTS_VIEW};",
+        warehouse=warehouse,
+    )[0]["total_shipments"]
 
     # On-time vs delayed
     counts = run_query(
-        """
+        f"""
         SELECT
           SUM(CASE WHEN status = 'delivered' THEN 1 ELSE 0 END) AS on_time,
           SUM(CASE WHEN status != 'delivered' THEN 1 ELSE 0 END) AS delayed
-        FROM shipments;
-    """
+        FROM {SHIPMENTS_VIEW};
+        """,
+        warehouse=warehouse,
     )[0]
 
     # Warehouse usage
-    utilization = warehouse_utilization()
+    utilization = warehouse_utilization(warehouse=warehouse)
 
     return {
         "total_shipments": total,
@@ -201,7 +709,9 @@ def summary_statistics() -> Dict[str, Any]:
 
 
 def received_count_by_carrier(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
 ) -> List[Dict[str, Any]]:
     """
     Returns count of shipments received per carrier per day,
@@ -214,15 +724,7 @@ def received_count_by_carrier(
     Returns:
       - List of { arrival_date, carrier, count }
     """
-    params: list[Any] = []
-    where_clauses: list[str] = []
-
-    if start_date:
-        where_clauses.append("arrival_date >= ?")
-        params.append(start_date)
-    if end_date:
-        where_clauses.append("arrival_date <= ?")
-        params.append(end_date)
+    where_clauses, params = _arrival_range_filters(start_date, end_date)
 
     where_sql = ""
     if where_clauses:
@@ -233,44 +735,51 @@ def received_count_by_carrier(
       arrival_date,
       carrier,
       COUNT(*) AS count
-    FROM shipments
+    FROM {SHIPMENTS_VIEW}
     {where_sql}
     GROUP BY arrival_date, carrier
     ORDER BY arrival_date, carrier;
     """
-    return run_query(sql, tuple(params))
+    return run_query(sql, tuple(params), warehouse=warehouse)
 
 
-def volume_by_mode() -> List[Dict[str, Any]]:
+def volume_by_mode(warehouse: str = DEFAULT_WAREHOUSE) -> List[Dict[str, Any]]:
     """
     Returns total shipment volume grouped by mode (air or sea).
     """
-    sql = """
+    sql = f"""
     SELECT
       mode,
       SUM(volume) AS total_volume
-    FROM shipments
+    FROM {SHIPMENTS_VIEW}
     GROUP BY mode;
     """
-    return run_query(sql)
+    return run_query(sql, warehouse=warehouse)
 
 
 def throughput_over_time(
-    start_date: Optional[str] = None, end_date: Optional[str] = None
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
 ) -> List[Dict[str, Any]]:
     """
     Returns number of packages received per day, optionally filtered
     by arrival_date between start_date and end_date.
+    With warehouse='all' daily counts are summed across shards.
     """
-    params: list[Any] = []
-    filters: list[str] = []
+    if warehouse == ALL_WAREHOUSES:
+        partials = _fan_out(throughput_over_time, start_date, end_date)
+        per_day: Dict[Any, int] = {}
+        for rows in partials.values():
+            for row in rows:
+                day = row["arrival_date"]
+                per_day[day] = per_day.get(day, 0) + row["packages_received"]
+        return [
+            {"arrival_date": day, "packages_received": count}
+            for day, count in sorted(per_day.items())
+        ]
 
-    if start_date:
-        filters.append("arrival_date >= ?")
-        params.append(start_date)
-    if end_date:
-        filters.append("arrival_date <= ?")
-        params.append(end_date)
+    filters, params = _arrival_range_filters(start_date, end_date)
 
     where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
 
@@ -278,15 +787,15 @@ def throughput_over_time(
     SELECT
       arrival_date,
       COUNT(*) AS packages_received
-    FROM shipments
+    FROM {SHIPMENTS_VIEW}
     {where_clause}
     GROUP BY arrival_date
     ORDER BY arrival_date;
     """
-    return run_query(sql, tuple(params))
+    return run_query(sql, tuple(params), warehouse=warehouse)
 
 
-def check_db_status() -> Dict[str, Any]:
+def check_db_status(warehouse: str = DEFAULT_WAREHOUSE) -> Dict[str, Any]:
     """
     Check whether the DuckDB file exists and if it has any shipments loaded.
     Returns:
@@ -296,29 +805,426 @@ def check_db_status() -> Dict[str, Any]:
         total_shipments: int
       }
     """
-    if not os.path.exists(DB_FILE):
+    if not os.path.exists(warehouse_db_file(warehouse)):
         return {"exists": False, "loaded": False, "total_shipments": 0}
 
     # File exists; see if the shipments table has any rows
     try:
-        tables = run_query("PRAGMA show_tables;")
+        tables = run_query("PRAGMA show_tables;", warehouse=warehouse)
         if not any(t["name"] == "shipments" for t in tables):
             return {"exists": True, "loaded": False, "total_shipments": 0}
 
-        total = run_query("SELECT COUNT(*) AS total_shipments FROM shipments;")[0][
-            "total_shipments"
-        ]
+        source = (
+            SHIPMENTS_VIEW
+            if any(t["name"] == SHIPMENTS_VIEW for t in tables)
+            else "shipments"
+        )
+        total = run_query(
+            f"SELECT COUNT(*) AS total_shipments FROM {source};",
+            warehouse=warehouse,
+        )[0]["total_shipments"]
         return {"exists": True, "loaded": total > 0, "total_shipments": total}
     except Exception:
         return {"exists": True, "loaded": False, "total_shipments": 0}
 
 
-def delete_db_file() -> bool:
+def _month_start(value: str) -> str:
+    """
+    First day of the month containing a 'YYYY-MM-DD' date.
+    """
+    return _parse_date(value).replace(day=1).isoformat()
+
+
+def _month_end(value: str) -> str:
+    """
+    Last day of the month containing a 'YYYY-MM-DD' date.
+    """
+    d = _parse_date(value)
+    next_month = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return (next_month - timedelta(days=1)).isoformat()
+
+
+def refresh_customer_stats(
+    warehouse: str = DEFAULT_WAREHOUSE,
+    source: str = SHIPMENTS_VIEW,
+    table: str = "customer_top_candidates",
+) -> None:
+    """
+    Rebuild customer_top_candidates, the heavy-hitter summary used by
+    top_customers(approximate=True).
+
+    For every (destination, month) and ranking metric it keeps only the
+    TOP_CUSTOMER_CANDIDATES highest customers with their totals in that
+    month. Its size is bounded by destinations x months x metrics rather
+    than by the number of customers. Per-customer rows at a finer grain
+    barely shrink the data, because most customers ship only a few times
+    a month. Built from the unified view so archived shipments keep
+    counting; rows without a parseable arrival_date are skipped.
+    """
+    ranked = [
+        f"""
+        SELECT '{metric}' AS metric, *
+        FROM monthly
+        QUALIFY ROW_NUMBER() OVER (
+          PARTITION BY destination, month_start
+          ORDER BY {column} DESC, customer_id
+        ) <= {TOP_CUSTOMER_CANDIDATES}
+        """
+        for metric, column in TOP_CUSTOMER_METRICS.items()
+    ]
+    run_query(
+        f"""
+        CREATE OR REPLACE TABLE {table} AS
+        WITH monthly AS (
+          SELECT
+            customer_id,
+            destination,
+            strftime(date_trunc('month', TRY_CAST(arrival_date AS DATE)), '%Y-%m-%d')
+              AS month_start,
+            COUNT(*) AS shipment_count,
+            CAST(SUM(weight) AS BIGINT) AS total_weight,
+            CAST(SUM(volume) AS BIGINT) AS total_volume
+          FROM {source}
+          WHERE TRY_CAST(arrival_date AS DATE) IS NOT NULL
+          GROUP BY ALL
+        )
+        {" UNION ALL ".join(ranked)};
+        """,
+        warehouse=warehouse,
+    )
+
+
+def top_customers(
+    metric: str = "volume",
+    limit: int = 10,
+    destination: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    approximate: bool = False,
+    warehouse: str = DEFAULT_WAREHOUSE,
+) -> (List[Dict[str, Any]], Optional[str], Optional[str]):
+    """
+    Returns the top customers ranked by shipment count, weight or volume,
+    optionally filtered by destination and arrival_date range.
+
+    The exact ranking aggregates the unified view directly. Date bounds
+    prune archive partitions there.
+
+    With approximate=True (and limit <= TOP_CUSTOMER_CANDIDATES) the
+    ranking is answered from customer_top_candidates. The date range is
+    widened to whole months, and a customer's total only counts the months
+    where they were among that month's top candidates. Totals can therefore
+    be underestimated for customers near the cut-off. Heavy hitters are
+    ranked correctly, and the work no longer depends on the number of
+    shipments.
+
+    Returns:
+      - List of { customer_id, shipment_count, total_weight, total_volume }
+      - start_date and end_date actually counted (widened when approximate)
+    """
+    order_column = TOP_CUSTOMER_METRICS[metric]
+
+    filters: List[str] = []
+    params: List[Any] = []
+
+    if destination:
+        filters.append("destination = ?")
+        params.append(destination)
+
+    if approximate and limit <= TOP_CUSTOMER_CANDIDATES:
+        start_date = _month_start(start_date) if start_date else None
+        end_date = _month_end(end_date) if end_date else None
+        filters.append("metric = ?")
+        params.append(metric)
+        if start_date:
+            filters.append("month_start >= ?")
+            params.append(start_date)
+        if end_date:
+            filters.append("month_start <= ?")
+            params.append(end_date)
+        source = "customer_top_candidates"
+        totals = """
+          CAST(SUM(shipment_count) AS BIGINT) AS shipment_count,
+          CAST(SUM(total_weight) AS BIGINT) AS total_weight,
+          CAST(SUM(total_volume) AS BIGINT) AS total_volume
+        """
+    else:
+        range_filters, range_params = _arrival_range_filters(start_date, end_date)
+        filters.extend(range_filters)
+        params.extend(range_params)
+        source = SHIPMENTS_VIEW
+        totals = """
+          COUNT(*) AS shipment_count,
+          CAST(SUM(weight) AS BIGINT) AS total_weight,
+          CAST(SUM(volume) AS BIGINT) AS total_volume
+        """
+
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    sql = f"""
+    SELECT
+      customer_id,
+      {totals}
+    FROM {source}
+    {where_clause}
+    GROUP BY customer_id
+    ORDER BY {order_column} DESC, customer_id
+    LIMIT ?;
+    """
+    rows = run_query(sql, tuple(params) + (limit,), warehouse=warehouse)
+    return rows, start_date, end_date
+
+
+def refresh_transit_stats(
+    warehouse: str = DEFAULT_WAREHOUSE,
+    source: str = SHIPMENTS_VIEW,
+    table: str = "transit_daily_hist",
+) -> None:
+    """
+    Rebuild transit_daily_hist: per arrival day, carrier, mode and destination,
+    a histogram of whole-day durations for each stage:
+      - dwell:   arrival_date -> departure_date
+      - transit: departure_date -> delivered_date
+
+    Durations are integer days, so these histograms are small, exact and
+    mergeable across any date range. Rows whose dates are missing or do not
+    parse have no duration and are left out.
+    """
+    run_query(
+        f"""
+        CREATE OR REPLACE TABLE {table} AS
+        WITH durations AS (
+          SELECT
+            arrival_date, carrier, mode, destination,
+            date_diff(
+              'day', TRY_CAST(arrival_date AS DATE), TRY_CAST(departure_date AS DATE)
+            ) AS dwell_days,
+            date_diff(
+              'day', TRY_CAST(departure_date AS DATE), TRY_CAST(delivered_date AS DATE)
+            ) AS transit_days
+          FROM {source}
+        )
+        SELECT
+          arrival_date, carrier, mode, destination,
+          'dwell' AS stage,
+          dwell_days AS days,
+          COUNT(*) AS n
+        FROM durations
+        WHERE dwell_days IS NOT NULL
+        GROUP BY ALL
+        UNION ALL
+        SELECT
+          arrival_date, carrier, mode, destination,
+          'transit' AS stage,
+          transit_days AS days,
+          COUNT(*) AS n
+        FROM durations
+        WHERE transit_days IS NOT NULL
+        GROUP BY ALL;
+        """,
+        warehouse=warehouse,
+    )
+
+
+def transit_time_percentiles(
+    group_by: str = "carrier",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    warehouse: str = DEFAULT_WAREHOUSE,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Returns dwell and transit time distributions (in days) per carrier,
+    mode or destination, optionally filtered by arrival_date range.
+
+    Percentiles are read off the merged per-day histograms rather than
+    sorting the underlying shipments.
+
+    Returns:
+      {
+        dwell:   [ { <group_by>, count, mean_days, p50_days, p90_days, p99_days } ],
+        transit: [ ... ]
+      }
+    """
+    if group_by not in ("carrier", "mode", "destination"):
+        raise ValueError(f"Unsupported group_by: {group_by}")
+
+    params: List[Any] = []
+    filters: List[str] = []
+
+    if start_date:
+        _parse_date(start_date)
+        filters.append("arrival_date >= ?")
+        params.append(start_date)
+    if end_date:
+        _parse_date(end_date)
+        filters.append("arrival_date <= ?")
+        params.append(end_date)
+
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+    sql = f"""
+    WITH merged AS (
+      SELECT stage, {group_by}, days, CAST(SUM(n) AS BIGINT) AS n
+      FROM transit_daily_hist
+      {where_clause}
+      GROUP BY stage, {group_by}, days
+    ),
+    cumulative AS (
+      SELECT
+        *,
+        CAST(SUM(n) OVER (PARTITION BY stage, {group_by} ORDER BY days) AS BIGINT)
+          AS cum_n,
+        CAST(SUM(n) OVER (PARTITION BY stage, {group_by}) AS BIGINT) AS total
+      FROM merged
+    )
+    SELECT
+      stage,
+      {group_by},
+      MAX(total) AS count,
+      SUM(days * n) / MAX(total) AS mean_days,
+      MIN(days) FILTER (WHERE cum_n >= 0.50 * total) AS p50_days,
+      MIN(days) FILTER (WHERE cum_n >= 0.90 * total) AS p90_days,
+      MIN(days) FILTER (WHERE cum_n >= 0.99 * total) AS p99_days
+    FROM cumulative
+    GROUP BY stage, {group_by}
+    ORDER BY stage, {group_by};
+    """
+    rows = run_query(sql, tuple(params), warehouse=warehouse)
+
+    result: Dict[str, List[Dict[str, Any]]] = {"dwell": [], "transit": []}
+    for row in rows:
+        result[row.pop("stage")].append(row)
+    return result
+
+
+def _build_derived_table(
+    table: str,
+    warehouse: str = DEFAULT_WAREHOUSE,
+    source: str = SHIPMENTS_VIEW,
+    target: Optional[str] = None,
+) -> None:
+    """
+    Build one of DERIVED_TABLES from `source`, into `target` if given.
+    """
+    builder = {
+        "customer_top_candidates": refresh_customer_stats,
+        "transit_daily_hist": refresh_transit_stats,
+    }[table]
+    builder(warehouse=warehouse, source=source, table=target or table)
+
+
+def ensure_derived_tables(warehouse: str = DEFAULT_WAREHOUSE) -> List[str]:
+    """
+    Create the unified view and aggregate tables if a loaded database is
+    missing them (e.g. it was written by an older version). Existing ones
+    are left alone, since uploads already keep them fresh and rebuilding
+    them would leave dead blocks behind.
+
+    Returns:
+      Names of the objects that were created.
+    """
+    if not os.path.exists(warehouse_db_file(warehouse)):
+        return []
+
+    tables = {
+        t["table_name"]
+        for t in run_query(
+            "SELECT table_name FROM duckdb_tables();", warehouse=warehouse
+        )
+    }
+    if "shipments" not in tables:
+        return []
+
+    views = {
+        v["view_name"]
+        for v in run_query(
+            "SELECT view_name FROM duckdb_views() WHERE NOT internal;",
+            warehouse=warehouse,
+        )
+    }
+
+    created = []
+    if SHIPMENTS_VIEW not in views:
+        refresh_shipments_view(warehouse=warehouse)
+        created.append(SHIPMENTS_VIEW)
+    for table in DERIVED_TABLES:
+        if table not in tables:
+            _build_derived_table(table, warehouse=warehouse)
+            created.append(table)
+    return created
+
+
+def checkpoint_database(warehouse: str = DEFAULT_WAREHOUSE) -> None:
+    """
+    Flush the WAL and mark blocks of dropped tables as free, so later
+    writes reuse them. DuckDB does not shrink the file itself.
+    """
+    run_query("CHECKPOINT;", warehouse=warehouse)
+
+
+def storage_report(warehouse: str = DEFAULT_WAREHOUSE) -> Dict[str, Any]:
+    """
+    Report on-disk and in-memory usage of the DuckDB database.
+
+    Returns:
+      {
+        file_size_bytes: int,
+        wal_size_bytes: int,
+        archive_size_bytes: int,
+        block_size: int,
+        total_blocks: int,
+        used_blocks: int,
+        free_blocks: int,
+        memory_usage: str,
+        memory_limit: str,
+        settings: dict,
+        tables: [ { table_name, row_count } ]
+      }
+    """
+    db_file = warehouse_db_file(warehouse)
+    if not os.path.exists(db_file):
+        raise FileNotFoundError(f"No DuckDB file for warehouse '{warehouse}'")
+
+    wal_file = db_file + ".wal"
+    archive_size = sum(
+        os.path.getsize(f)
+        for f in glob.glob(_archive_glob(warehouse=warehouse), recursive=True)
+    )
+    size = run_query("PRAGMA database_size;", warehouse=warehouse)[0]
+
+    tables = []
+    for t in run_query(
+        "SELECT table_name FROM duckdb_tables() WHERE NOT temporary ORDER BY table_name;",
+        warehouse=warehouse,
+    ):
+        count = run_query(
+            f'SELECT COUNT(*) AS c FROM "{t["table_name"]}";', warehouse=warehouse
+        )[0]["c"]
+        tables.append({"table_name": t["table_name"], "row_count": count})
+
+    return {
+        "file_size_bytes": os.path.getsize(db_file),
+        "wal_size_bytes": os.path.getsize(wal_file) if os.path.exists(wal_file) else 0,
+        "archive_size_bytes": archive_size,
+        "block_size": size["block_size"],
+        "total_blocks": size["total_blocks"],
+        "used_blocks": size["used_blocks"],
+        "free_blocks": size["free_blocks"],
+        "memory_usage": size["memory_usage"],
+        "memory_limit": size["memory_limit"],
+        "settings": DUCKDB_SETTINGS,
+        "tables": tables,
+    }
+
+
+def delete_db_file(warehouse: str = DEFAULT_WAREHOUSE) -> bool:
     """
-    Delete the on-disk DuckDB file to reset state.
+    Delete the on-disk DuckDB file and the Parquet archive to reset state.
     Returns True if file was deleted, False if it did not exist.
     """
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
+    clear_archive(warehouse=warehouse)
+    db_file = warehouse_db_file(warehouse)
+    if os.path.exists(db_file):
+        os.remove(db_file)
         return True
     return False
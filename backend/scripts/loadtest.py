@@ -0,0 +1,313 @@
+"""
+Concurrent load generator for the shipment dashboard API.
+
+Simulates N dashboards polling metric endpoints with a weighted traffic mix,
+optionally while a large CSV is uploaded, and reports per-endpoint latency
+percentiles, error rates and throughput.
+
+Event-loop stalls on the server are detected with a probe that polls
+/openapi.json (served on the event loop without touching DuckDB); probe
+latencies above --stall-threshold-ms are flagged. Lag of the generator's
+own loop is reported too, so a saturated client is not mistaken for a
+slow server.
+
+NOTE: --upload-* replaces the dataset on the target server. Run against a
+scratch instance, e.g.:
+
+    uvicorn app.main:app --port 8000
+    python scripts/loadtest.py --dashboards 100 --duration 60 --upload-rows 2000000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Default dashboard traffic mix: path -> relative weight
+DEFAULT_MIX = {
+    "/metrics/summary": 1.0,
+    "/metrics/throughput": 1.0,
+    "/metrics/shipments?page=1&page_size=100": 1.0,
+}
+
+STALL_PROBE_PATH = "/openapi.json"
+
+DESTINATIONS = ["GUY", "SVG", "SLU", "BIM", "DOM", "GRD", "SKN", "ANU", "SXM", "FSXM"]
+CARRIERS = ["FEDEX", "DHL", "USPS", "UPS", "AMAZON"]
+STATES = ["FL", "NY", "NJ", "TX", "CA", "GA", "MA", "PA"]
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    """
+    Parse a traffic mix given as "path=weight,path=weight" or a JSON file path.
+    """
+    if not spec:
+        return dict(DEFAULT_MIX)
+    if spec.endswith(".json"):
+        with open(spec) as f:
+            return {path: float(w) for path, w in json.load(f).items()}
+    mix = {}
+    for part in spec.split(","):
+        path, _, weight = part.rpartition("=")
+        mix[path.strip()] = float(weight)
+    return mix
+
+
+def synthetic_csv(rows: int, seed: int = 0) -> bytes:
+    """
+    Generate a shipments CSV with the columns expected by /upload.
+    """
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=365)
+    buffer = io.StringIO()
+    buffer.write(
+        "shipment_id,customer_id,origin,destination,weight,volume,carrier,"
+        "mode,status,arrival_date,departure_date,delivered_date\n"
+    )
+    for i in range(rows):
+        arrival = start + timedelta(days=rng.randrange(365))
+        status = rng.choice(["received", "intransit", "delivered"])
+        departure = arrival + timedelta(days=rng.randrange(1, 10))
+        delivered = departure + timedelta(days=rng.randrange(1, 20))
+        buffer.write(
+            f"{4000000 + i},{rng.randint(10000, 35000)},{rng.choice(STATES)},"
+            f"{rng.choice(DESTINATIONS)},{rng.randint(100, 50000)},"
+            f"{rng.randint(1000, 500000)},{rng.choice(CARRIERS)},"
+            f"{rng.choice(['air', 'sea'])},{status},{arrival.isoformat()},"
+            f"{departure.isoformat() if status != 'received' else ''},"
+            f"{delivered.isoformat() if status == 'delivered' else ''}\n"
+        )
+    return buffer.getvalue().encode()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    rank = max(0, min(len(sorted_values) - 1, rank))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """
+    Collects per-endpoint latencies (ms) and error counts.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, elapsed_ms: float, ok: bool) -> None:
+        self.latencies[name].append(elapsed_ms)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, duration_s: float) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            report[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "error_rate": self.errors[name] / len(values),
+                "rps": len(values) / duration_s,
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": values[-1],
+            }
+        return report
+
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    name: str,
+    method: str,
+    url: str,
+    **kwargs,
+) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(name, (time.perf_counter() - started) * 1000, ok)
+
+
+async def dashboard(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    mix: Dict[str, float],
+    think_time_s: float,
+    deadline: float,
+    rng: random.Random,
+) -> None:
+    paths, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        path = rng.choices(paths, weights)[0]
+        await timed_request(client, recorder, path, "GET", path)
+        # Jitter so dashboards do not poll in lockstep
+        await asyncio.sleep(think_time_s * rng.uniform(0.5, 1.5))
+
+
+async def uploader(
+    client: httpx.AsyncClient, recorder: Recorder, payload: bytes, delay_s: float
+) -> None:
+    await asyncio.sleep(delay_s)
+    await timed_request(
+        client,
+        recorder,
+        "POST /upload",
+        "POST",
+        "/upload/",
+        files={"file": ("loadtest.csv", payload, "text/csv")},
+        timeout=None,
+    )
+
+
+async def stall_probe(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    interval_s: float,
+    threshold_ms: float,
+    deadline: float,
+    stalls: List[Dict[str, float]],
+    t0: float,
+) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(STALL_PROBE_PATH)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        recorder.record("probe " + STALL_PROBE_PATH, elapsed_ms, ok)
+        if elapsed_ms > threshold_ms:
+            stalls.append(
+                {"at_s": round(started - t0, 3), "latency_ms": round(elapsed_ms, 1)}
+            )
+        await asyncio.sleep(interval_s)
+
+
+async def loop_lag_monitor(interval_s: float, deadline: float, lags: List[float]) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        lags.append((time.perf_counter() - started - interval_s) * 1000)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    payload = None
+    if args.upload_csv:
+        with open(args.upload_csv, "rb") as f:
+            payload = f.read()
+    elif args.upload_rows:
+        payload = synthetic_csv(args.upload_rows, seed=args.seed)
+
+    recorder = Recorder()
+    stalls: List[Dict[str, float]] = []
+    client_lags: List[float] = []
+    limits = httpx.Limits(max_connections=args.dashboards + 2)
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        tasks = [
+            dashboard(
+                client, recorder, mix, args.think_time, deadline,
+                random.Random(args.seed + i),
+            )
+            for i in range(args.dashboards)
+        ]
+        tasks.append(
+            stall_probe(
+                client, recorder, args.probe_interval, args.stall_threshold_ms,
+                deadline, stalls, t0,
+            )
+        )
+        tasks.append(loop_lag_monitor(args.probe_interval, deadline, client_lags))
+        if payload is not None:
+            tasks.append(uploader(client, recorder, payload, args.upload_delay))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    client_lags.sort()
+    return {
+        "duration_s": round(elapsed, 2),
+        "dashboards": args.dashboards,
+        "mix": mix,
+        "endpoints": recorder.summary(elapsed),
+        "server_stalls": stalls,
+        "client_loop_lag_ms": {
+            "p99": percentile(client_lags, 99),
+            "max": client_lags[-1] if client_lags else 0.0,
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['dashboards']} dashboards for {report['duration_s']}s\n")
+    header = (
+        f"{'endpoint':<45} {'reqs':>7} {'err%':>6} {'rps':>8} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, s in report["endpoints"].items():
+        print(
+            f"{name[:45]:<45} {s['requests']:>7} {s['error_rate'] * 100:>5.1f}% "
+            f"{s['rps']:>8.1f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}"
+        )
+    stalls = report["server_stalls"]
+    print(f"\nServer event-loop stalls: {len(stalls)}")
+    for stall in stalls[:20]:
+        print(f"  t={stall['at_s']:>8.3f}s  probe latency {stall['latency_ms']:.1f} ms")
+    lag = report["client_loop_lag_ms"]
+    print(f"Client loop lag: p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--dashboards", type=int, default=100, help="Concurrent pollers")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between polls")
+    parser.add_argument(
+        "--mix", help='Traffic mix "path=weight,..." or a JSON file {path: weight}'
+    )
+    parser.add_argument("--upload-csv", help="CSV file to upload during the run")
+    parser.add_argument("--upload-rows", type=int, help="Upload a synthetic CSV of N rows")
+    parser.add_argument("--upload-delay", type=float, default=5.0, help="Seconds before upload")
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    parser.add_argument("--stall-threshold-ms", type=float, default=250.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,8 +18,8 @@ export default function Navbar() {
   // Combined delete DB then logout
   const handleLogout = async () => {
     try {
-      // delete DuckDB file
-      await fetch(`${process.env.NEXT_PUBLIC_API_URL}/admin/db`, {
+      // delete every warehouse's DuckDB file
+      await fetch(`${process.env.NEXT_PUBLIC_API_URL}/admin/db?warehouse=all`, {
         method: "DELETE",
       });
     } catch (e) {